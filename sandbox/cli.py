@@ -0,0 +1,137 @@
+'''
+Purpose:
+* Command line entry point for the Banjo-Tooie Sandbox workflows.
+* Heavy modules are imported inside each command, so quick commands like
+  'info' and 'crc' start without loading the extraction and compression code.
+'''
+
+###################
+##### IMPORTS #####
+###################
+
+import sys
+import time
+
+#####################
+##### CONSTANTS #####
+#####################
+
+# Seconds from entering main() to the command returning
+# 'crc' has to checksum the first 1 MiB of the ROM, 'info' only reads the header
+_STARTUP_BUDGET_DICT:dict = {
+    "info": 0.1,
+    "crc": 0.5,
+}
+
+####################
+##### COMMANDS #####
+####################
+
+def _format_hex(int_val:int, byte_count:int):
+    '''
+    Turns an integer into a zero-padded hexadecimal string.
+    '''
+    return f"{int_val:0{byte_count * 2}X}"
+
+def _run_info(args):
+    '''
+    Prints the ROM header without reading the rest of the ROM.
+    '''
+    from sandbox.patching.bt_rom_class import BT_ROM_CLASS
+    bt_rom = BT_ROM_CLASS(args.rom_path)
+    header_info:dict = bt_rom.read_rom_header_info()
+    print(f"Title: {header_info['Title']}")
+    print(f"Game Code: {header_info['Game Code']}")
+    print(f"Version: {header_info['Version']}")
+    print(f"CRC1: {_format_hex(header_info['CRC1'], 4)}")
+    print(f"CRC2: {_format_hex(header_info['CRC2'], 4)}")
+
+def _run_crc(args):
+    '''
+    Calculates the ROM's checksums and compares them against the header.
+    '''
+    from sandbox.patching.bt_rom_class import BT_ROM_CLASS
+    bt_rom = BT_ROM_CLASS(args.rom_path)
+    header_info:dict = bt_rom.read_rom_header_info()
+    crc1, crc2 = bt_rom.calculate_rom_crc()
+    if((crc1, crc2) != (header_info["CRC1"], header_info["CRC2"])):
+        print(f"Header CRC1: {_format_hex(header_info['CRC1'], 4)}")
+        print(f"Header CRC2: {_format_hex(header_info['CRC2'], 4)}")
+        print("WARNING: _run_crc: Header checksums do not match")
+        return 1
+    return 0
+
+def _run_extract(args):
+    '''
+    Extracts and decompresses every asset in the ROM.
+    '''
+    from sandbox.patching.bt_rom_class import BT_ROM_CLASS, _BIN_EXTENSION, _EXTRACTED_FILES_DIR
+    extracted_files_dir:str = args.output_dir or _EXTRACTED_FILES_DIR
+    bt_rom = BT_ROM_CLASS(args.rom_path, extracted_files_dir)
+    bt_rom.clear_extracted_files_dir(_BIN_EXTENSION)
+    bt_rom.extract_asset_table_pointers()
+
+def _run_build(args):
+    '''
+    Saves the ROM to a new file and updates its checksums.
+    '''
+    from sandbox.patching.bt_rom_class import BT_ROM_CLASS
+    bt_rom = BT_ROM_CLASS(args.rom_path)
+    bt_rom.save_as_new_rom(args.new_rom_path)
+    bt_rom._run_crc_tool(args.new_rom_path)
+
+################
+##### MAIN #####
+################
+
+def _build_parser():
+    '''
+    Creates the argument parser for every subcommand.
+    '''
+    import argparse
+    parser = argparse.ArgumentParser(prog="bt-sandbox", description="Banjo-Tooie Sandbox tools")
+    parser.add_argument("--timing", action="store_true",
+        help="print how long the command took and warn if a quick command is over budget")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    info_parser = subparsers.add_parser("info", help="print the ROM header")
+    info_parser.add_argument("rom_path")
+    info_parser.set_defaults(func=_run_info)
+    crc_parser = subparsers.add_parser("crc", help="calculate the ROM checksums")
+    crc_parser.add_argument("rom_path")
+    crc_parser.set_defaults(func=_run_crc)
+    extract_parser = subparsers.add_parser("extract", help="extract and decompress the ROM assets")
+    extract_parser.add_argument("rom_path")
+    extract_parser.add_argument("--output-dir",
+        help="directory for the extracted files, defaults to the package's extracted_files directory")
+    extract_parser.set_defaults(func=_run_extract)
+    build_parser = subparsers.add_parser("build", help="save the ROM to a new file with updated checksums")
+    build_parser.add_argument("rom_path")
+    build_parser.add_argument("new_rom_path")
+    build_parser.set_defaults(func=_run_build)
+    return parser
+
+def main(argv:list|None=None):
+    '''
+    Runs the requested subcommand and returns its exit code.
+    '''
+    start_time:float = time.perf_counter()
+    args = _build_parser().parse_args(argv)
+    try:
+        exit_code = args.func(args) or 0
+    except (OSError, ValueError) as err:
+        # Scripted pipelines get one line on stderr instead of a traceback
+        error_message:str = str(err)
+        if(not error_message.startswith("ERROR:")):
+            error_message = f"ERROR: main: '{args.command}' failed: {error_message}"
+        print(error_message, file=sys.stderr)
+        return 2
+    if(args.timing):
+        elapsed_seconds:float = time.perf_counter() - start_time
+        print(f"INFO: main: '{args.command}' took {elapsed_seconds:.3f}s", file=sys.stderr)
+        budget_seconds:float|None = _STARTUP_BUDGET_DICT.get(args.command)
+        if(budget_seconds is not None and elapsed_seconds > budget_seconds):
+            print(f"WARNING: main: '{args.command}' is over its {budget_seconds:.3f}s budget", file=sys.stderr)
+    return exit_code
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -16,13 +16,14 @@ class Generic_Bin_File_Class():
     '''
     Base class for reading, modifying, and saving a binary file.
     '''
-    def __init__(self, file_path:str):
+    def __init__(self, file_path:str, read_file_bool:bool=True):
         '''
         Constructor
         '''
         self._file_path = file_path
         self._file_content = None
-        self._read_file()
+        if(read_file_bool):
+            self._read_file()
 
     ###################
     ##### NUMBERS #####
@@ -8,11 +8,52 @@ Purpose:
 ###################
 
 import os
-import subprocess
+import struct
 import zlib
+from functools import reduce
+from itertools import cycle
+from operator import xor
 
 from sandbox.generic_bin_file_class import Generic_Bin_File_Class
-from sandbox.patching.compression_class import COMPRESSION_CLASS
+
+#####################
+##### CONSTANTS #####
+#####################
+
+_ASSET_TABLE_START_INDEX:int = 0x5188
+# _ASSET_TABLE_END_INDEX:int = 0x11A24
+_ASSET_ID_START:int = 0x000
+_ASSET_ID_END:int = 0x3666
+_ASSET_TABLE_INTERVAL:int = 0x4
+_ASSET_TABLE_OFFSET:int = 0x12B24
+_ROM_END_INDEX:int = 0x0
+_ASM_END:int = 0x0
+_CIC:int = 0xDF26F436
+_CRC1_INDEX_START:int = 0x10
+_CRC2_INDEX_START:int = 0x14
+_CHECK_ROM_START_INDEX:int = 0x1000
+_CHECK_ROM_END_INDEX:int = 0x101000
+# Resolved from the package, so the tools work from any working directory
+_PATCHING_DIR:str = os.path.dirname(os.path.abspath(__file__))
+_RN64CRC_PATH:str = os.path.join(_PATCHING_DIR, "rn64crc.exe")
+_EXTRACTED_FILES_DIR:str = os.path.join(os.path.dirname(_PATCHING_DIR), "extracted_files")
+_BIN_EXTENSION:str = ".bin"
+_COMPRESSED_BIN_EXTENSION:str = f"-Compressed{_BIN_EXTENSION}"
+_DECOMPRESSED_BIN_EXTENSION:str = f"-Decompressed{_BIN_EXTENSION}"
+_RAW_BIN_EXTENSION:str = f"-Raw{_BIN_EXTENSION}"
+_FILE_EMPTY_STR:str = "File Empty"
+_DECOMPRESSED_STR:str = "Decompressed"
+_COMPRESSED_STR:str = "Compressed"
+_RAW_STR:str = "Raw"
+_ASSET_FILE:str = "Asset"
+_ASSEMBLY_FILE:str = "Assembly"
+_ROM_HEADER_SIZE:int = 0x40
+_ROM_TITLE_INDEX_START:int = 0x20
+_ROM_TITLE_LENGTH:int = 0x14
+_ROM_GAME_CODE_INDEX_START:int = 0x3B
+_ROM_GAME_CODE_LENGTH:int = 0x4
+_ROM_VERSION_INDEX:int = 0x3F
+_CRC_LOOKUP_INDEX_START:int = 0x0040 + 0x0710
 
 ########################
 ##### BT ROM CLASS #####
@@ -22,52 +63,43 @@ class BT_ROM_CLASS(Generic_Bin_File_Class):
     '''
     Runs the ROM extracting and inserting workflows.
     '''
-    def __init__(self, file_path:str):
+    def __init__(self, file_path:str, extracted_files_dir:str=_EXTRACTED_FILES_DIR):
         '''
         Constructor
         '''
+        ### VARIABLES ###
+        self._extracted_files_dir:str = extracted_files_dir
+
         ### SUPER ###
-        super().__init__(file_path)
-
-        ### CONSTANTS ###
-        self._ASSET_TABLE_START_INDEX:int = 0x5188
-        # self._ASSET_TABLE_END_INDEX:int = 0x11A24
-        self._ASSET_ID_START:int = 0x000
-        self._ASSET_ID_END:int = 0x3666
-        self._ASSET_TABLE_INTERVAL:int = 0x4
-        self._ASSET_TABLE_OFFSET:int = 0x12B24
-        self._ROM_END_INDEX:int = 0x0
-        self._ASM_END:int = 0x0
-        self._CIC = 0xDF26F436
-        self._CRC1_INDEX_START:int = 0x10
-        self._CRC2_INDEX_START:int = 0x14
-        self._CHECK_ROM_START_INDEX:int = 0x1000
-        self._CHECK_ROM_END_INDEX:int = 0x101000
-        self._EXTRACTED_FILES_DIR:str = "sandbox/extracted_files/"
-        self._BIN_EXTENSION:str = ".bin"
-        self._COMPRESSED_BIN_EXTENSION:str = f"-Compressed{self._BIN_EXTENSION}"
-        self._DECOMPRESSED_BIN_EXTENSION:str = f"-Decompressed{self._BIN_EXTENSION}"
-        self._RAW_BIN_EXTENSION:str = f"-Raw{self._BIN_EXTENSION}"
-        self._FILE_EMPTY_STR:str = "File Empty"
-        self._DECOMPRESSED_STR:str = "Decompressed"
-        self._COMPRESSED_STR:str = "Compressed"
-        self._RAW_STR:str = "Raw"
-        self._ASSET_FILE:str = "Asset"
-        self._ASSEMBLY_FILE:str = "Assembly"
-        ### SETUP ###
-        self._create_extracted_files_directory()
+        # The ROM is only read once a workflow needs its contents
+        super().__init__(file_path, read_file_bool=False)
     
     #################
     ##### SETUP #####
     #################
-        
+
+    @property
+    def _file_content(self):
+        '''
+        Returns the ROM as a byte array, reading it from disk on first use.
+        '''
+        if(self._rom_content is None):
+            self._read_file()
+        return self._rom_content
+
+    @_file_content.setter
+    def _file_content(self, file_content:bytearray):
+        '''
+        Sets the ROM byte array.
+        '''
+        self._rom_content = file_content
+
     def _create_extracted_files_directory(self):
         '''
         Creates an extracted files directory.
         '''
         print(f"INFO: _create_extracted_files_directory: Creating extracted files directory...")
-        if(not os.path.exists(self._EXTRACTED_FILES_DIR)):
-            os.mkdir(self._EXTRACTED_FILES_DIR)
+        os.makedirs(self._extracted_files_dir, exist_ok=True)
         print(f"INFO: _create_extracted_files_directory: Creation complete!")
 
     ################################
@@ -78,7 +110,7 @@ class BT_ROM_CLASS(Generic_Bin_File_Class):
         '''
         Pass
         '''
-        asset_index:int = (self._read_bytes_as_int(pointer_index_start, 4) >> 8) * 4 + self._ASSET_TABLE_OFFSET
+        asset_index:int = (self._read_bytes_as_int(pointer_index_start, 4) >> 8) * 4 + _ASSET_TABLE_OFFSET
         return asset_index
 
     def _extract_asset_by_pointer(self, pointer_index_start:int, file_name:str):
@@ -86,8 +118,8 @@ class BT_ROM_CLASS(Generic_Bin_File_Class):
         Pass
         '''
         asset_index_start:int = self._asset_pointer_to_address(pointer_index_start)
-        asset_index_end:int = self._asset_pointer_to_address(pointer_index_start + self._ASSET_TABLE_INTERVAL)
-        file_path:str = f"{self._EXTRACTED_FILES_DIR}{file_name}{self._COMPRESSED_BIN_EXTENSION}"
+        asset_index_end:int = self._asset_pointer_to_address(pointer_index_start + _ASSET_TABLE_INTERVAL)
+        file_path:str = os.path.join(self._extracted_files_dir, f"{file_name}{_COMPRESSED_BIN_EXTENSION}")
         with open(file_path, "wb+") as comp_file:
             comp_file.write(self._file_content[asset_index_start:asset_index_end])
         debug_pointer_index_start:str = self._convert_int_to_hex_str(pointer_index_start, byte_count=4)
@@ -99,12 +131,14 @@ class BT_ROM_CLASS(Generic_Bin_File_Class):
         '''
         Pass
         '''
+        from sandbox.patching.compression_class import COMPRESSION_CLASS
+        self._create_extracted_files_directory()
         for asset_id in range(
-                self._ASSET_ID_START,
-                self._ASSET_ID_END,
-                self._ASSET_TABLE_INTERVAL):
+                _ASSET_ID_START,
+                _ASSET_ID_END,
+                _ASSET_TABLE_INTERVAL):
             try:
-                pointer_index_start:int = self._ASSET_TABLE_START_INDEX + 4 * asset_id
+                pointer_index_start:int = _ASSET_TABLE_START_INDEX + 4 * asset_id
                 if(asset_id >= 0x9F4 and asset_id < 0xB34):
                     continue
                 if(asset_id % 500 == 0):
@@ -114,7 +148,7 @@ class BT_ROM_CLASS(Generic_Bin_File_Class):
                 file_name:str = self._convert_int_to_hex_str(pointer_index_start)
                 debug_pointer_index_start, debug_asset_index_start, debug_asset_index_end =\
                     self._extract_asset_by_pointer(pointer_index_start, file_name)
-                compressed_obj = COMPRESSION_CLASS(file_name, self._COMPRESSED_STR)
+                compressed_obj = COMPRESSION_CLASS(file_name, _COMPRESSED_STR, self._extracted_files_dir)
                 decrypt_bool:bool = False
                 compressed_obj.decompress_file_main(asset_id, decrypt_bool)
             except zlib.error as err:
@@ -137,46 +171,87 @@ class BT_ROM_CLASS(Generic_Bin_File_Class):
         '''
         return int_val & 0xFFFFFFFF
     
-    def _rotate_left(self, j:int, b:int):
-        '''
-        Rotate left machine language function.
-        '''
-        return self._unsigned_long(j << b) | (j >> (-b & 0x1F))
-
     def _calculate_new_crc(self):
         '''
         Calculates the new CRC checksum values for Banjo-Tooie.
         '''
-        t1 = t2 = t3 = t4 = t5 = t6 = self._CIC
-        for index_count, check_index in enumerate(range(self._CHECK_ROM_START_INDEX, self._CHECK_ROM_END_INDEX, 0x4)):
-            d = self._read_bytes_as_int(check_index, byte_count=4)
-            t6d = self._unsigned_long(t6 + d)
-            if(t6d < t6):
-                t4 = self._unsigned_long(t4 + 1)
-            t6 = t6d
-            t3 ^= d
-            r = self._rotate_left(d, d & 0x1F)
-            t5 = self._unsigned_long(t5 + r)
+        check_word_count:int = (_CHECK_ROM_END_INDEX - _CHECK_ROM_START_INDEX) // 0x4
+        rom_head:bytes = self._read_rom_head(_CHECK_ROM_END_INDEX)
+        if(len(rom_head) < _CHECK_ROM_END_INDEX):
+            raise ValueError(f"ERROR: _calculate_new_crc: '{self._file_path}' is too small to checksum")
+        check_words:tuple = struct.unpack_from(f">{check_word_count}I", rom_head, _CHECK_ROM_START_INDEX)
+        # The lookup word only depends on the low byte of the check index
+        lookup_words:tuple = struct.unpack_from(">64I", rom_head, _CRC_LOOKUP_INDEX_START)
+        rotated_words:list = [
+            ((d << (d & 0x1F)) & 0xFFFFFFFF) | (d >> (-d & 0x1F))
+            for d in check_words
+        ]
+        # t2 depends on the running t6, so it is the only value that needs a per word loop
+        t2 = t6 = _CIC
+        for d, r in zip(check_words, rotated_words):
+            t6 = (t6 + d) & 0xFFFFFFFF
             if(t2 > d):
                 t2 ^= r
             else:
                 t2 ^= t6 ^ d
-            byte_place:int = 0x0040 + 0x0710 + (index_count & 0xFF)
-            byte_place_val:int = self._read_bytes_as_int(byte_place, byte_count=4)
-            t1 = t1 + (self._unsigned_long(byte_place_val) ^ d)
+        # t4 counts how many times the running t6 sum overflowed
+        check_sum:int = _CIC + sum(check_words)
+        t4 = self._unsigned_long(_CIC + (check_sum >> 32))
+        t3 = reduce(xor, check_words, _CIC)
+        t5 = _CIC + sum(rotated_words)
+        t1 = _CIC + sum(map(xor, cycle(lookup_words), check_words))
         crc1 = self._unsigned_long(t6 ^ t4 ^ t3)
         crc2 = self._unsigned_long(t5 ^ t2 ^ t1)
         print(f"CRC1: {self._convert_int_to_hex_str(crc1, byte_count=4)}")
         print(f"CRC2: {self._convert_int_to_hex_str(crc2, byte_count=4)}")
-        # self._write_bytes_from_int(self._CRC1_INDEX_START, crc1, 4)
-        # self._write_bytes_from_int(self._CRC2_INDEX_START, crc2, 4)
+        # self._write_bytes_from_int(_CRC1_INDEX_START, crc1, 4)
+        # self._write_bytes_from_int(_CRC2_INDEX_START, crc2, 4)
+        return crc1, crc2
+
+    def calculate_rom_crc(self):
+        '''
+        Returns the CRC1 and CRC2 values calculated from the ROM's contents.
+        '''
+        return self._calculate_new_crc()
 
     def _run_crc_tool(self, new_file_path:str):
         '''
         Pass
         '''
-        cmd =  f"{os.getcwd()}/sandbox/patching/rn64crc.exe -u {new_file_path}"
-        subprocess.Popen(cmd.split(),shell=True).communicate()
+        import subprocess
+        cmd:list = [_RN64CRC_PATH, "-u", new_file_path]
+        subprocess.Popen(cmd, shell=True).communicate()
+
+    ##################
+    ##### HEADER #####
+    ##################
+
+    def _read_rom_head(self, byte_count:int):
+        '''
+        Returns the first bytes of the ROM without reading the rest of the ROM.
+        '''
+        if(self._rom_content is not None):
+            return bytes(self._rom_content[:byte_count])
+        with open(self._file_path, "rb") as rom_file:
+            return rom_file.read(byte_count)
+
+    def read_rom_header_info(self):
+        '''
+        Returns the title, game code, version, and stored CRC values from the ROM header.
+        '''
+        rom_header:bytes = self._read_rom_head(_ROM_HEADER_SIZE)
+        if(len(rom_header) < _ROM_HEADER_SIZE):
+            raise ValueError(f"ERROR: read_rom_header_info: '{self._file_path}' is too small to be a ROM")
+        title_index_end:int = _ROM_TITLE_INDEX_START + _ROM_TITLE_LENGTH
+        game_code_index_end:int = _ROM_GAME_CODE_INDEX_START + _ROM_GAME_CODE_LENGTH
+        header_info:dict = {
+            "Title": str(rom_header[_ROM_TITLE_INDEX_START:title_index_end], encoding="latin-1").strip(),
+            "Game Code": str(rom_header[_ROM_GAME_CODE_INDEX_START:game_code_index_end], encoding="latin-1"),
+            "Version": rom_header[_ROM_VERSION_INDEX],
+            "CRC1": int.from_bytes(rom_header[_CRC1_INDEX_START:_CRC1_INDEX_START + 4], byteorder="big"),
+            "CRC2": int.from_bytes(rom_header[_CRC2_INDEX_START:_CRC2_INDEX_START + 4], byteorder="big"),
+        }
+        return header_info
 
     ##########################
     ##### POST FUNCTIONS #####
@@ -195,10 +270,13 @@ class BT_ROM_CLASS(Generic_Bin_File_Class):
         Removes bin files from the extracted files directory that end with a certain filter
         '''
         print(f"INFO: _clear_extracted_files_dir: Cleaning files ending in {filter}...")
-        bin_files_list = os.listdir(self._EXTRACTED_FILES_DIR)
+        if(not os.path.exists(self._extracted_files_dir)):
+            print(f"INFO: _clear_extracted_files_dir: Nothing to clean!")
+            return
+        bin_files_list = os.listdir(self._extracted_files_dir)
         for file_name in bin_files_list:
             if(file_name.endswith(filter)):
-                os.remove(os.path.join(self._EXTRACTED_FILES_DIR, file_name))
+                os.remove(os.path.join(self._extracted_files_dir, file_name))
         print(f"INFO: _clear_extracted_files_dir: Cleaning complete!")
 
 ################
@@ -209,10 +287,10 @@ if __name__ == '__main__':
     file_path:str = "C:/Users/Cyrus/Documents/VS_Code/Banjo_Tooie_Sandbox/Banjo-Tooie.z64"
     new_file_path:str = "C:/Users/Cyrus/Documents/VS_Code/Banjo_Tooie_Sandbox/Banjo-Tooie-TEST.z64"
     bt_rom = BT_ROM_CLASS(file_path)
-    bt_rom.clear_extracted_files_dir(bt_rom._BIN_EXTENSION)
+    bt_rom.clear_extracted_files_dir(_BIN_EXTENSION)
     bt_rom.extract_asset_table_pointers()
     # bt_rom.append_asset_table_pointers()
     # bt_rom._calculate_new_crc()
     bt_rom.save_as_new_rom(new_file_path)
     bt_rom._run_crc_tool(new_file_path)
-    # bt_rom.clear_extracted_files_dir(bt_rom._BIN_EXTENSION)
\ No newline at end of file
+    # bt_rom.clear_extracted_files_dir(_BIN_EXTENSION)
\ No newline at end of file
@@ -9,13 +9,59 @@ Purpose:
 
 import os
 import zlib
-import gzip
 from shutil import copy
 from math import ceil
 import subprocess
 
 from sandbox.generic_bin_file_class import Generic_Bin_File_Class
 
+#####################
+##### CONSTANTS #####
+#####################
+
+_WBITS:int = -15
+_HEADER_SIZE:int = 0x2
+_HEADER_UNIT:int = 0x10
+_INFLATE_CHUNK_SIZE:int = 0x4000
+# Resolved from the package, so the tools work from any working directory
+_PATCHING_DIR:str = os.path.dirname(os.path.abspath(__file__))
+_GZIP_PATH:str = os.path.join(_PATCHING_DIR, "GZIP.EXE")
+_EXTRACTED_FILES_DIR:str = os.path.join(os.path.dirname(_PATCHING_DIR), "extracted_files")
+_COMPRESSED_BIN_EXTENSION:str = "-Compressed.bin"
+_DECOMPRESSED_BIN_EXTENSION:str = "-Decompressed.bin"
+_RAW_BIN_EXTENSION:str = "-Raw.bin"
+_DECOMPRESSED_STR:str = "Decompressed"
+_COMPRESSED_STR:str = "Compressed"
+_RAW_STR:str = "Raw"
+_TEMPORARY_BIN:str = "tmp.bin"
+_ASSET_FILE:str = "Asset"
+_ASSEMBLY_FILE:str = "Assembly"
+_PADDING_BYTE:str = "Padding Byte"
+_PADDING_INTERVAL:str = "Padding Interval"
+_PADDING_DICT:dict = {
+    _ASSET_FILE: {
+        _PADDING_BYTE: b"\xAA",
+        _PADDING_INTERVAL: 0x08,
+    },
+    _ASSEMBLY_FILE: {
+        _PADDING_BYTE: b"\x00",
+        _PADDING_INTERVAL: 0x10,
+    },
+}
+_SKIP_ASSET_POINTERS:list = [
+    "78B4", "78B8",
+]
+_CIC_LUT0:tuple = (
+    0x4, 0x7, 0xA, 0x7, 0xE, 0x5, 0xE, 0x1,
+    0xC, 0xF, 0x8, 0xF, 0x6, 0x3, 0x6, 0x9
+)
+_CIC_LUT1:tuple = (
+    0x4, 0x1, 0xA, 0x7, 0xE, 0x5, 0xE, 0x1,
+    0xC, 0x9, 0x8, 0x5, 0x6, 0x3, 0xC, 0x9
+)
+# Asset Id -> Decryption XOR Key
+_CIC_VALUE_CACHE:dict = {}
+
 #############################
 ##### COMPRESSION CLASS #####
 #############################
@@ -24,41 +70,12 @@ class COMPRESSION_CLASS(Generic_Bin_File_Class):
     '''
     Runs the compression and decompression algorithms on files.
     '''
-    def __init__(self, file_name:str, file_type:str):
+    def __init__(self, file_name:str, file_type:str, extracted_files_dir:str=_EXTRACTED_FILES_DIR):
         '''
         Constructor
         '''
-        ### CONSTANTS ###
-        self._WBITS:int = -15
-        # self._GZIP_PATH:str = f"{os.path.dirname(os.path.abspath(__file__))}/GZIP.EXE"
-        self._GZIP_PATH:str = f"sandbox/patching/GZIP.EXE"
-        self._EXTRACTED_FILES_DIR:str = "sandbox/extracted_files/"
-        self._COMPRESSED_BIN_EXTENSION:str = "-Compressed.bin"
-        self._DECOMPRESSED_BIN_EXTENSION:str = "-Decompressed.bin"
-        self._RAW_BIN_EXTENSION:str = "-Raw.bin"
-        self._DECOMPRESSED_STR:str = "Decompressed"
-        self._COMPRESSED_STR:str = "Compressed"
-        self._RAW_STR:str = "Raw"
-        self._TEMPORARY_BIN:str = "tmp.bin"
-        self._ASSET_FILE:str = "Asset"
-        self._ASSEMBLY_FILE:str = "Assembly"
-        self._PADDING_BYTE:str = "Padding Byte"
-        self._PADDING_INTERVAL:str = "Padding Interval"
-        self._PADDING_DICT:dict = {
-            self._ASSET_FILE: {
-                self._PADDING_BYTE: b"\xAA",
-                self._PADDING_INTERVAL: 0x08,
-            },
-            self._ASSEMBLY_FILE: {
-                self._PADDING_BYTE: b"\x00",
-                self._PADDING_INTERVAL: 0x10,
-            },
-        }
-        self._SKIP_ASSET_POINTERS:list = [
-            "78B4", "78B8",
-        ]
-
         ### VARIABLES ###
+        self._extracted_files_dir:str = extracted_files_dir
         self._file_name:str = file_name
         self._file_type:str = file_type
         self._file_path:str = None
@@ -74,15 +91,15 @@ class COMPRESSION_CLASS(Generic_Bin_File_Class):
         '''
         Sets the current file's path based on the file extention.
         '''
-        if(file_type == self._COMPRESSED_STR):
-            file_ext = self._COMPRESSED_BIN_EXTENSION
-        elif(file_type == self._DECOMPRESSED_STR):
-            file_ext = self._DECOMPRESSED_BIN_EXTENSION
-        elif(file_type == self._RAW_STR):
-            file_ext = self._RAW_BIN_EXTENSION
+        if(file_type == _COMPRESSED_STR):
+            file_ext = _COMPRESSED_BIN_EXTENSION
+        elif(file_type == _DECOMPRESSED_STR):
+            file_ext = _DECOMPRESSED_BIN_EXTENSION
+        elif(file_type == _RAW_STR):
+            file_ext = _RAW_BIN_EXTENSION
         else:
             raise Exception("ERROR: _determine_file_path: Unknown File Extension")
-        self._file_path:str = self._EXTRACTED_FILES_DIR + self._file_name + file_ext
+        self._file_path:str = os.path.join(self._extracted_files_dir, self._file_name + file_ext)
 
     ######################
     ##### DECOMPRESS #####
@@ -93,10 +110,10 @@ class COMPRESSION_CLASS(Generic_Bin_File_Class):
         Determines whether the current file is empty, compressed, or decompressed.
         '''
         if(len(self._file_content) == 0):
-            return self._DECOMPRESSED_STR
-        elif(self._file_name in self._SKIP_ASSET_POINTERS):
-            return self._RAW_STR
-        return self._COMPRESSED_STR
+            return _DECOMPRESSED_STR
+        elif(self._file_name in _SKIP_ASSET_POINTERS):
+            return _RAW_STR
+        return _COMPRESSED_STR
 
     def _generate_cic_result(self,
             chl:list, rsp:list, list_len:int):
@@ -104,14 +121,8 @@ class COMPRESSION_CLASS(Generic_Bin_File_Class):
         Pass
         '''
         key = 0xB
-        lut0 = [
-            0x4, 0x7, 0xA, 0x7, 0xE, 0x5, 0xE, 0x1,
-            0xC, 0xF, 0x8, 0xF, 0x6, 0x3, 0x6, 0x9
-        ]
-        lut1 = [
-            0x4, 0x1, 0xA, 0x7, 0xE, 0x5, 0xE, 0x1,
-            0xC, 0x9, 0x8, 0x5, 0x6, 0x3, 0xC, 0x9
-        ]
+        lut0 = _CIC_LUT0
+        lut1 = _CIC_LUT1
         lut = lut0
         for i in range(list_len):
             rsp[i] = ((key + 5 * chl[i]) & 0xF)
@@ -135,11 +146,12 @@ class COMPRESSION_CLASS(Generic_Bin_File_Class):
                 lut = lut0
         return rsp
 
-    def _decrypt_file(self,
-            asset_id:int, file_content:bytearray, file_size:int):
+    def _generate_cic_value(self, asset_id:int):
         '''
-        Pass
+        Returns the XOR key for an asset id, computing it only the first time the id is seen.
         '''
+        if(asset_id in _CIC_VALUE_CACHE):
+            return _CIC_VALUE_CACHE[asset_id]
         rsp = [0] * 0x20
         input_key = [0] * 0x10
         key = asset_id - 0x995
@@ -165,6 +177,15 @@ class COMPRESSION_CLASS(Generic_Bin_File_Class):
         cic_value = [0] * 0x10
         for x in range(0, 0x20, 2):
             cic_value[x // 2] = (rsp[x] << 4) | rsp[x + 1]
+        _CIC_VALUE_CACHE[asset_id] = cic_value
+        return cic_value
+
+    def _decrypt_file(self,
+            asset_id:int, file_content:bytearray, file_size:int):
+        '''
+        Pass
+        '''
+        cic_value:list = self._generate_cic_value(asset_id)
         new_file_content = file_content
         for x in range(file_size):
             value = file_content[x]
@@ -172,31 +193,100 @@ class COMPRESSION_CLASS(Generic_Bin_File_Class):
         return new_file_content
 
 
-    def _decompress_file(self, asset_id:int, decrypt_bool:bool=False):
+    def _read_decompressed_size_hint(self):
+        '''
+        Validates the compressed file's header and returns the maximum decompressed size it allows.
+        The header stores the decompressed size divided by 0x10, rounded up.
+        '''
+        if(len(self._file_content) < _HEADER_SIZE):
+            raise zlib.error(f"ERROR: _read_decompressed_size_hint: File '{self._file_name}' is {len(self._file_content)} byte(s), shorter than the size header")
+        size_hint:int = self._read_bytes_as_int(0x0, _HEADER_SIZE)
+        return size_hint * _HEADER_UNIT
+
+    def _check_trailing_padding(self, trailing_data:memoryview, trailing_offset:int, padding_byte:bytes):
+        '''
+        Verifies every byte after the end of the compressed stream is the padding byte.
+        '''
+        padding_int:int = padding_byte[0]
+        for byte_count, curr_byte in enumerate(trailing_data):
+            if(curr_byte != padding_int):
+                bad_offset:str = self._convert_int_to_hex_str(trailing_offset + byte_count, 4)
+                raise zlib.error(f"ERROR: _check_trailing_padding: File '{self._file_name}' has non-padding byte {curr_byte:02X} after the compressed stream at offset 0x{bad_offset}")
+
+    def _consumed_offset(self, compressor_obj, input_index:int):
+        '''
+        Returns the file offset of the next compressed byte zlib has not consumed.
+        '''
+        return _HEADER_SIZE + input_index - len(compressor_obj.unconsumed_tail)
+
+    def _decompress_file(self, asset_id:int, decrypt_bool:bool=False, padding_byte:bytes=_PADDING_DICT[_ASSET_FILE][_PADDING_BYTE]):
         '''
         Creates a decompressed version of a compressed file.
+        The output buffer is preallocated from the size header and filled in fixed-size chunks,
+        so memory use stays bounded by the header instead of the stream's contents.
         '''
-        # Remove Decompress Size & Padding
-        # for byte_count, curr_byte in enumerate(reversed(self._file_content)):
-        #     if(curr_byte != 0xAA):
-        #         break
-        # file_content = self._file_content[2:-byte_count]
-        file_content = self._file_content[2:]
+        # Size Header
+        decompressed_capacity:int = self._read_decompressed_size_hint()
+        decompressed_buffer = bytearray(decompressed_capacity)
+        decompressed_view = memoryview(decompressed_buffer)
+        # Remove Decompress Size Without Copying
+        raw_content = memoryview(self._file_content)[_HEADER_SIZE:]
+        file_size:int = len(raw_content)
+        file_content = raw_content
         if(decrypt_bool):
-            file_size:int = len(file_content)
-            file_content= self._decrypt_file(asset_id, file_content, file_size)
+            # Decrypt a copy, decrypting in place would corrupt the file on a second call
+            file_content = self._decrypt_file(asset_id, bytearray(raw_content), file_size)
         # ZLIB Decompress
-        compressor_obj = zlib.decompressobj(wbits=self._WBITS)
-        decompressed_file_bytes = compressor_obj.decompress(file_content)
-        decompressed_file_path:str = self._EXTRACTED_FILES_DIR + self._file_name + self._DECOMPRESSED_BIN_EXTENSION
+        compressor_obj = zlib.decompressobj(wbits=_WBITS)
+        input_index:int = 0
+        output_index:int = 0
+        # zlib can hold output it has not returned yet, even after reading all of its input
+        drained_bool:bool = True
+        while(not compressor_obj.eof):
+            if(compressor_obj.unconsumed_tail):
+                pending_input = compressor_obj.unconsumed_tail
+            elif(not drained_bool):
+                pending_input = b""
+            elif(input_index < file_size):
+                pending_input = file_content[input_index:input_index + _INFLATE_CHUNK_SIZE]
+                input_index += len(pending_input)
+            else:
+                truncated_offset:str = self._convert_int_to_hex_str(_HEADER_SIZE + file_size, 4)
+                raise zlib.error(f"ERROR: _decompress_file: File '{self._file_name}' compressed stream is truncated at offset 0x{truncated_offset}")
+            # One byte past the capacity is allowed through so over-long streams are caught
+            max_length:int = min(_INFLATE_CHUNK_SIZE, decompressed_capacity - output_index + 1)
+            try:
+                decompressed_chunk = compressor_obj.decompress(pending_input, max_length)
+            except zlib.error as err:
+                error_offset:str = self._convert_int_to_hex_str(self._consumed_offset(compressor_obj, input_index), 4)
+                raise zlib.error(f"ERROR: _decompress_file: File '{self._file_name}' failed at offset 0x{error_offset}: {err}") from err
+            drained_bool = (not pending_input) and (not decompressed_chunk)
+            chunk_end:int = output_index + len(decompressed_chunk)
+            if(chunk_end > decompressed_capacity):
+                header_size:str = self._convert_int_to_hex_str(decompressed_capacity, 4)
+                error_offset:str = self._convert_int_to_hex_str(self._consumed_offset(compressor_obj, input_index), 4)
+                raise zlib.error(f"ERROR: _decompress_file: File '{self._file_name}' decompresses past the header size 0x{header_size} at offset 0x{error_offset}")
+            decompressed_view[output_index:chunk_end] = decompressed_chunk
+            output_index = chunk_end
+        # Header Size Check
+        if(output_index <= decompressed_capacity - _HEADER_UNIT):
+            header_size:str = self._convert_int_to_hex_str(decompressed_capacity, 4)
+            output_size:str = self._convert_int_to_hex_str(output_index, 4)
+            raise zlib.error(f"ERROR: _decompress_file: File '{self._file_name}' decompressed to 0x{output_size} bytes, short of the header size 0x{header_size}")
+        # Trailing Padding Check
+        # Padding is stored unencrypted, so it is checked against the raw bytes
+        trailing_length:int = len(compressor_obj.unused_data) + file_size - input_index
+        trailing_index:int = file_size - trailing_length
+        self._check_trailing_padding(raw_content[trailing_index:], _HEADER_SIZE + trailing_index, padding_byte)
+        decompressed_file_path:str = os.path.join(self._extracted_files_dir, self._file_name + _DECOMPRESSED_BIN_EXTENSION)
         with open(decompressed_file_path, "wb+") as decompressed_file:
-            decompressed_file.write(decompressed_file_bytes)
+            decompressed_file.write(decompressed_view[:output_index])
 
     def _copy_compressed_to_raw(self):
         '''
         Copies an extracted file as a raw file.
         '''
-        raw_file_path:str = self._EXTRACTED_FILES_DIR + self._file_name + self._RAW_BIN_EXTENSION
+        raw_file_path:str = os.path.join(self._extracted_files_dir, self._file_name + _RAW_BIN_EXTENSION)
         copy(self._file_path, raw_file_path)
     
     ####################
@@ -208,10 +298,10 @@ class COMPRESSION_CLASS(Generic_Bin_File_Class):
         Pass
         '''
         # CONSTANTS
-        decompressed_path:str = self._EXTRACTED_FILES_DIR + self._file_name + self._DECOMPRESSED_BIN_EXTENSION
-        temp_path:str = self._EXTRACTED_FILES_DIR + "temp" + self._COMPRESSED_BIN_EXTENSION
-        compressed_path:str = self._EXTRACTED_FILES_DIR + self._file_name + self._COMPRESSED_BIN_EXTENSION
-        gzip_command:str = f'"{self._GZIP_PATH}" -c -9 "{decompressed_path}" >> "{temp_path}"'
+        decompressed_path:str = os.path.join(self._extracted_files_dir, self._file_name + _DECOMPRESSED_BIN_EXTENSION)
+        temp_path:str = os.path.join(self._extracted_files_dir, "temp" + _COMPRESSED_BIN_EXTENSION)
+        compressed_path:str = os.path.join(self._extracted_files_dir, self._file_name + _COMPRESSED_BIN_EXTENSION)
+        gzip_command:str = f'"{_GZIP_PATH}" -c -9 "{decompressed_path}" >> "{temp_path}"'
         # FILE SIZE
         file_size:int = len(self._file_content)
         compressed_header:int = ceil(file_size / 0x10)
@@ -239,26 +329,27 @@ class COMPRESSION_CLASS(Generic_Bin_File_Class):
     ##### MAIN FUNCTIONS #####
     ##########################
 
-    def decompress_file_main(self, asset_id:int, decrypt_bool:bool):
+    def decompress_file_main(self, asset_id:int, decrypt_bool:bool, file_category:str=_ASSET_FILE):
         '''
         Runs the main workflow for prepping a file for modifying.
         The file may be decompressed or copied as raw.
         '''
         file_type:str = self._check_extracted_file_type()
-        if(file_type == self._COMPRESSED_STR):
-            self._decompress_file(asset_id, decrypt_bool)
-        elif(file_type == self._DECOMPRESSED_STR):
+        if(file_type == _COMPRESSED_STR):
+            padding_byte:bytes = _PADDING_DICT[file_category][_PADDING_BYTE]
+            self._decompress_file(asset_id, decrypt_bool, padding_byte)
+        elif(file_type == _DECOMPRESSED_STR):
             self._copy_compressed_to_raw()
     
     def compress_file_main(self, file_category:str):
         '''
         Pass
         '''
-        padding_byte:bytes = self._PADDING_DICT[file_category][self._PADDING_BYTE]
-        padding_interval:int = self._PADDING_DICT[file_category][self._PADDING_INTERVAL]
-        if(self._file_type == self._DECOMPRESSED_STR):
+        padding_byte:bytes = _PADDING_DICT[file_category][_PADDING_BYTE]
+        padding_interval:int = _PADDING_DICT[file_category][_PADDING_INTERVAL]
+        if(self._file_type == _DECOMPRESSED_STR):
             compressed_content_length:int = self._compress_file(padding_byte, padding_interval)
-        elif(self._file_type == self._RAW_STR):
+        elif(self._file_type == _RAW_STR):
             compressed_content_length:int = self._copy_raw_to_compressed()
         else:
             raise Exception(f"Error: compress_file_main: Unidentified file type '{self._file_type}'")
@@ -290,4 +381,4 @@ if __name__ == '__main__':
     file_name:str = "7960-GED"
     print(f"File Name: 7960 Map Setup: CS - 'Two Years have Passed'")
     compression_obj = COMPRESSION_CLASS(file_name, "Decompressed")
-    compression_obj.compress_file_main(compression_obj._ASSET_FILE)
\ No newline at end of file
+    compression_obj.compress_file_main(_ASSET_FILE)
\ No newline at end of file
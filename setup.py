@@ -24,4 +24,9 @@ setup(
     license='MIT',
     packages=packages,
     zip_safe=False,
+    entry_points={
+        "console_scripts": [
+            "bt-sandbox=sandbox.cli:main",
+        ],
+    },
 )
\ No newline at end of file
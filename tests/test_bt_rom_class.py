@@ -0,0 +1,97 @@
+'''
+Purpose:
+* Tests for the Banjo-Tooie ROM checksum and the crc command.
+'''
+
+###################
+##### IMPORTS #####
+###################
+
+import random
+import struct
+
+import pytest
+
+from sandbox import cli
+from sandbox.patching.bt_rom_class import BT_ROM_CLASS
+
+###################
+##### HELPERS #####
+###################
+
+def _reference_crc(rom_content:bytes):
+    '''
+    Straight per-word port of the n64crc 6105 checksum.
+    '''
+    t1 = t2 = t3 = t4 = t5 = t6 = 0xDF26F436
+    for check_index in range(0x1000, 0x101000, 0x4):
+        d = struct.unpack_from(">I", rom_content, check_index)[0]
+        if(((t6 + d) & 0xFFFFFFFF) < t6):
+            t4 = (t4 + 1) & 0xFFFFFFFF
+        t6 = (t6 + d) & 0xFFFFFFFF
+        t3 ^= d
+        r = ((d << (d & 0x1F)) & 0xFFFFFFFF) | (d >> (-d & 0x1F))
+        t5 = (t5 + r) & 0xFFFFFFFF
+        if(t2 > d):
+            t2 ^= r
+        else:
+            t2 ^= t6 ^ d
+        lookup_word = struct.unpack_from(">I", rom_content, 0x0040 + 0x0710 + (check_index & 0xFF))[0]
+        t1 = (t1 + (lookup_word ^ d)) & 0xFFFFFFFF
+    return (t6 ^ t4 ^ t3) & 0xFFFFFFFF, (t5 ^ t2 ^ t1) & 0xFFFFFFFF
+
+@pytest.fixture(scope="module")
+def rom_content():
+    '''
+    A fixed-seed 2 MiB ROM with its correct CRCs written to the header.
+    '''
+    rom_content = bytearray(random.Random(0xB7).randbytes(0x200000))
+    crc1, crc2 = _reference_crc(rom_content)
+    rom_content[0x10:0x18] = struct.pack(">II", crc1, crc2)
+    return bytes(rom_content)
+
+def _write_rom(tmp_path, rom_content:bytes):
+    '''
+    Writes the ROM and returns its path.
+    '''
+    rom_path = tmp_path / "rom.z64"
+    rom_path.write_bytes(rom_content)
+    return str(rom_path)
+
+#################
+##### TESTS #####
+#################
+
+def test_calculate_rom_crc_matches_reference(tmp_path, rom_content):
+    bt_rom = BT_ROM_CLASS(_write_rom(tmp_path, rom_content))
+    assert bt_rom.calculate_rom_crc() == struct.unpack_from(">II", rom_content, 0x10)
+    assert bt_rom._rom_content is None
+
+def test_calculate_rom_crc_known_values(tmp_path, rom_content):
+    bt_rom = BT_ROM_CLASS(_write_rom(tmp_path, rom_content))
+    assert bt_rom.calculate_rom_crc() == (0x1894EAF4, 0x34374468)
+
+def test_crc_command_matching_header(tmp_path, capsys, rom_content):
+    assert cli.main(["crc", _write_rom(tmp_path, rom_content)]) == 0
+    assert "WARNING" not in capsys.readouterr().out
+
+def test_crc_command_mismatched_header(tmp_path, capsys, rom_content):
+    bad_rom_content = bytearray(rom_content)
+    bad_rom_content[0x14] ^= 0xFF
+    assert cli.main(["crc", _write_rom(tmp_path, bytes(bad_rom_content))]) == 1
+    assert "Header checksums do not match" in capsys.readouterr().out
+
+def test_calculate_rom_crc_too_small(tmp_path, rom_content):
+    bt_rom = BT_ROM_CLASS(_write_rom(tmp_path, rom_content[:0x100FFF]))
+    with pytest.raises(ValueError, match="too small to checksum"):
+        bt_rom.calculate_rom_crc()
+
+def test_crc_command_too_small(tmp_path, capsys, rom_content):
+    assert cli.main(["crc", _write_rom(tmp_path, rom_content[:0x100FFF])]) == 2
+    assert capsys.readouterr().err.strip().endswith("is too small to checksum")
+
+def test_crc_command_missing_rom(tmp_path, capsys):
+    assert cli.main(["crc", str(tmp_path / "missing.z64")]) == 2
+    error_lines:list = capsys.readouterr().err.strip().splitlines()
+    assert len(error_lines) == 1
+    assert error_lines[0].startswith("ERROR: main: 'crc' failed:")
@@ -0,0 +1,80 @@
+'''
+Purpose:
+* Tests for the command line entry point's fast path.
+'''
+
+###################
+##### IMPORTS #####
+###################
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from sandbox import cli
+from sandbox.patching import bt_rom_class
+
+###################
+##### HELPERS #####
+###################
+
+@pytest.fixture
+def bt_rom_list(monkeypatch):
+    '''
+    Records every BT_ROM_CLASS the command line creates.
+    '''
+    bt_rom_list:list = []
+    class RECORDING_BT_ROM_CLASS(bt_rom_class.BT_ROM_CLASS):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            bt_rom_list.append(self)
+    monkeypatch.setattr(bt_rom_class, "BT_ROM_CLASS", RECORDING_BT_ROM_CLASS)
+    return bt_rom_list
+
+def _write_header_only_rom(tmp_path):
+    '''
+    Writes a ROM that is only the 0x40 byte header.
+    '''
+    rom_header = bytearray(0x40)
+    rom_header[0x10:0x18] = bytes.fromhex("0123456789ABCDEF")
+    rom_header[0x20:0x34] = b"BANJO TOOIE         "
+    rom_header[0x3B:0x3F] = b"NB7E"
+    rom_path = tmp_path / "header_only.z64"
+    rom_path.write_bytes(rom_header)
+    return str(rom_path)
+
+_REPO_DIR:str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter, so modules imported by this test file do not count
+_LAZY_IMPORT_SCRIPT:str = '''
+import sys
+from sandbox import cli
+assert "sandbox.patching.bt_rom_class" not in sys.modules, "imported before a command ran"
+assert cli.main(["info", sys.argv[1]]) == 0
+for module_name in ("sandbox.patching.compression_class", "subprocess"):
+    assert module_name not in sys.modules, f"info imported {module_name}"
+'''
+
+#################
+##### TESTS #####
+#################
+
+def test_info_does_not_import_heavy_modules(tmp_path):
+    rom_path:str = _write_header_only_rom(tmp_path)
+    result = subprocess.run([sys.executable, "-c", _LAZY_IMPORT_SCRIPT, rom_path],
+        cwd=_REPO_DIR, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert "Title: BANJO TOOIE" in result.stdout
+
+def test_info_does_not_read_rom(tmp_path, capsys, bt_rom_list):
+    rom_path:str = _write_header_only_rom(tmp_path)
+    assert cli.main(["info", rom_path]) == 0
+    assert len(bt_rom_list) == 1
+    assert bt_rom_list[0]._rom_content is None
+    output:str = capsys.readouterr().out
+    assert "Title: BANJO TOOIE" in output
+    assert "Game Code: NB7E" in output
+    assert "CRC1: 01234567" in output
+    assert "CRC2: 89ABCDEF" in output
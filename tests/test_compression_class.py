@@ -0,0 +1,126 @@
+'''
+Purpose:
+* Tests for the streaming decompression in the compression class.
+'''
+
+###################
+##### IMPORTS #####
+###################
+
+import zlib
+import random
+from math import ceil
+
+import pytest
+
+from sandbox.patching.compression_class import COMPRESSION_CLASS
+
+###################
+##### HELPERS #####
+###################
+
+@pytest.fixture
+def extracted_files_dir(tmp_path):
+    '''
+    Gives each test its own extracted files directory.
+    '''
+    return tmp_path
+
+def _deflate(data:bytes):
+    '''
+    Raw deflate, the same stream GZIP.EXE writes after its header.
+    '''
+    compressor_obj = zlib.compressobj(9, zlib.DEFLATED, -15)
+    return compressor_obj.compress(data) + compressor_obj.flush()
+
+def _write_compressed_file(extracted_files_dir, file_name:str, data:bytes,
+        size_hint:int|None=None, trailing_bytes:bytes=b"", pad_bool:bool=True):
+    '''
+    Writes a compressed file with a size header, optional trailing bytes, and 0xAA padding.
+    '''
+    if(size_hint is None):
+        size_hint = ceil(len(data) / 0x10)
+    file_content:bytes = size_hint.to_bytes(2, byteorder="big") + _deflate(data) + trailing_bytes
+    while(pad_bool and len(file_content) % 0x08):
+        file_content += b"\xAA"
+    (extracted_files_dir / f"{file_name}-Compressed.bin").write_bytes(file_content)
+    return file_content
+
+def _decompress(extracted_files_dir, file_name:str):
+    '''
+    Runs the decompression workflow and returns the decompressed bytes.
+    '''
+    compression_obj = COMPRESSION_CLASS(file_name, "Compressed", str(extracted_files_dir))
+    compression_obj.decompress_file_main(0x0, False)
+    return (extracted_files_dir / f"{file_name}-Decompressed.bin").read_bytes()
+
+######################
+##### ROUND TRIP #####
+######################
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"\x00" * 0x10,
+    b"\x00" * 0x4040,
+    b"\x00" * 16456,
+    bytes(range(0x100)) * 0x100,
+    random.Random(0x9F6).randbytes(0x5000),
+], ids=["empty", "boundary", "multiple-of-0x10", "highly-compressible", "larger-than-chunk", "random"])
+@pytest.mark.parametrize("pad_bool", [True, False], ids=["padded", "unpadded"])
+def test_round_trip(extracted_files_dir, data, pad_bool):
+    _write_compressed_file(extracted_files_dir, "test", data, pad_bool=pad_bool)
+    assert _decompress(extracted_files_dir, "test") == data
+
+def test_round_trip_many_compressible_sizes(extracted_files_dir):
+    for data_size in range(0x3F00, 0x4400, 0x8):
+        data:bytes = b"\x00" * data_size
+        _write_compressed_file(extracted_files_dir, "test", data, pad_bool=False)
+        assert _decompress(extracted_files_dir, "test") == data
+
+def test_decrypt_does_not_modify_file_content(extracted_files_dir):
+    _write_compressed_file(extracted_files_dir, "test", b"\x00" * 0x100)
+    compression_obj = COMPRESSION_CLASS("test", "Compressed", str(extracted_files_dir))
+    file_content:bytes = bytes(compression_obj._file_content)
+    try:
+        compression_obj._decompress_file(0x9F6, decrypt_bool=True)
+    except zlib.error:
+        pass
+    assert compression_obj._file_content == file_content
+
+####################
+##### FAILURES #####
+####################
+
+def test_truncated_stream(extracted_files_dir):
+    data:bytes = random.Random(0x1).randbytes(0x800)
+    file_content:bytes = _write_compressed_file(extracted_files_dir, "test", data, pad_bool=False)
+    (extracted_files_dir / "test-Compressed.bin").write_bytes(file_content[:-0x10])
+    with pytest.raises(zlib.error, match=f"truncated at offset 0x{len(file_content) - 0x10:08X}"):
+        _decompress(extracted_files_dir, "test")
+
+def test_over_long_stream(extracted_files_dir):
+    file_content:bytes = _write_compressed_file(extracted_files_dir, "test", b"\x00" * 0x5000, size_hint=0x10)
+    # The whole file fits in one input chunk, and zlib stops once it has produced one byte past 0x100
+    decompressor_obj = zlib.decompressobj(wbits=-15)
+    decompressor_obj.decompress(file_content[2:], 0x101)
+    consumed_offset:int = len(file_content) - len(decompressor_obj.unconsumed_tail)
+    assert consumed_offset < len(file_content)
+    with pytest.raises(zlib.error, match=f"decompresses past the header size 0x00000100 at offset 0x{consumed_offset:08X}$"):
+        _decompress(extracted_files_dir, "test")
+
+def test_short_of_header(extracted_files_dir):
+    _write_compressed_file(extracted_files_dir, "test", b"\x00" * 0x100, size_hint=0x20)
+    with pytest.raises(zlib.error, match="short of the header size 0x00000200"):
+        _decompress(extracted_files_dir, "test")
+
+def test_bad_trailing_byte(extracted_files_dir):
+    data:bytes = b"\x00" * 0x100
+    bad_offset:int = 2 + len(_deflate(data))
+    _write_compressed_file(extracted_files_dir, "test", data, trailing_bytes=b"\x01")
+    with pytest.raises(zlib.error, match=f"non-padding byte 01 after the compressed stream at offset 0x{bad_offset:08X}"):
+        _decompress(extracted_files_dir, "test")
+
+def test_corrupt_stream_reports_consumed_offset(extracted_files_dir):
+    (extracted_files_dir / "test-Compressed.bin").write_bytes(b"\x00\x10" + b"\xFF" * 0x20)
+    with pytest.raises(zlib.error, match="failed at offset 0x00000003"):
+        _decompress(extracted_files_dir, "test")